@@ -1,5 +1,9 @@
 # ComfyUI 노드 로더를 위한 초기화 파일
 from .nodes.image_prompt_extractor import NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS
+from .nodes.input_watcher import start_from_env
+
+# IMAGE_PROMPT_EXTRACTOR_WATCH=1 인 경우에만 입력 폴더 감시 시작
+start_from_env()
 
 # 노드 클래스와 디스플레이 이름 매핑을 내보냅니다
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS'] 
\ No newline at end of file
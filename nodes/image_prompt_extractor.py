@@ -3,6 +3,7 @@ import json
 from PIL import Image
 import PIL.PngImagePlugin
 import codecs
+import math
 import re
 import numpy as np
 import torch
@@ -23,6 +24,15 @@ import torch  # PyTorch 추가
 
 # 메타데이터 및 프롬프트 추출을 위한 유틸리티 클래스
 class ImagePromptUtils:
+    # 추출 결과 캐시 ((경로, mtime, 크기) → 프롬프트)와 번역 캐시 (한글 구간 → 영어)
+    # 서비스 모드에서는 여러 프로세스가 공유하는 dict로 교체됨
+    result_cache = {}
+    translation_cache = {}
+    cache_max_entries = 1024
+
+    # 번역기 생성 함수 (테스트/서비스에서 스텁 번역기로 교체 가능)
+    translator_factory = GoogleTranslator
+
     @staticmethod
     def needs_unicode_decode(text):
         """텍스트가 유니코드 이스케이프 시퀀스인지 확인"""
@@ -74,7 +84,7 @@ class ImagePromptUtils:
             return text
         
         try:
-            translator = GoogleTranslator(source='ko', target='en')
+            translator = ImagePromptUtils.translator_factory(source='ko', target='en')
             
             # 텍스트가 매우 길면 청크로 나누어 번역
             if len(text) > chunk_size:
@@ -92,6 +102,254 @@ class ImagePromptUtils:
             print(f"번역 오류: {e}")
             return text
 
+    @staticmethod
+    def tokenize_prompt(text):
+        """ComfyUI/A1111 프롬프트 문법을 한 번의 순회로 토큰 목록으로 분리합니다.
+
+        각 토큰은 {"type": ..., "text": ...} 형태이며, 모든 토큰의 text를 이어 붙이면 원문과 같습니다.
+        type: text, comma, paren_open, paren_close, bracket_open, bracket_close, brace_open, brace_close,
+              alt, weight, lora, wildcard, break
+        """
+        if not text or not isinstance(text, str):
+            return []
+
+        tokens = []
+        length = len(text)
+        text_start = 0  # 현재 누적 중인 텍스트 구간의 시작 위치
+        depth = 0  # 괄호 중첩 깊이 (가중치 표기 판별용)
+        # <lora:name:0.8> 형태의 태그만 인정 (내부에 <, >, 쉼표가 없어야 함, >_< 같은 태그는 텍스트)
+        tag_pattern = re.compile(r'<[\w.\-]+:[^<>,]*>')
+        # __name__ 형태의 와일드카드 파일 참조 (하위 폴더 포함)
+        wildcard_pattern = re.compile(r'__(?!_)[\w.\-/*]+?__')
+        i = 0
+
+        def flush(end):
+            if end > text_start:
+                tokens.append({"type": "text", "text": text[text_start:end]})
+
+        while i < length:
+            ch = text[i]
+
+            # 이스케이프된 문자는 텍스트로 취급
+            if ch == "\\" and i + 1 < length:
+                i += 2
+                continue
+
+            kind = None
+            end = i + 1
+
+            if ch == ",":
+                kind = "comma"
+            elif ch in "([{":
+                kind = {"(": "paren_open", "[": "bracket_open", "{": "brace_open"}[ch]
+                depth += 1
+            elif ch in ")]}":
+                kind = {")": "paren_close", "]": "bracket_close", "}": "brace_close"}[ch]
+                depth = max(depth - 1, 0)
+            elif ch == "|" and depth > 0:
+                # [a|b] 교차 또는 {a|b} 무작위 선택
+                kind = "alt"
+            elif ch == ":" and depth > 0:
+                # (단어:1.2) 또는 [a:b:0.5] 형태의 숫자 가중치는 닫는 괄호 바로 앞에서만 인정
+                j = i + 1
+                while j < length and text[j] == " ":
+                    j += 1
+                num_start = j
+                while j < length and (text[j].isdigit() or text[j] in ".-"):
+                    j += 1
+                while j < length and text[j] == " ":
+                    j += 1
+                if j > num_start and j < length and text[j] in ")]":
+                    kind = "weight"
+                    end = j
+            elif ch == "<":
+                # <lora:name:0.8> 등의 태그는 통째로 하나의 토큰
+                match = tag_pattern.match(text, i)
+                if match:
+                    kind = "lora"
+                    end = match.end()
+            elif ch == "_" and text.startswith("__", i):
+                # 와일드카드 이름은 번역하지 않도록 통째로 하나의 토큰
+                match = wildcard_pattern.match(text, i)
+                if match:
+                    kind = "wildcard"
+                    end = match.end()
+            elif ch == "B" and text.startswith("BREAK", i):
+                # 단어 경계에 있는 BREAK 키워드만 인정
+                before_ok = i == 0 or not text[i - 1].isalnum()
+                after_ok = i + 5 >= length or not text[i + 5].isalnum()
+                if before_ok and after_ok:
+                    kind = "break"
+                    end = i + 5
+
+            if kind is None:
+                i += 1
+                continue
+
+            flush(i)
+            tokens.append({"type": kind, "text": text[i:end]})
+            i = end
+            text_start = end
+
+        flush(length)
+        return tokens
+
+    @staticmethod
+    def prompt_tags(tokens):
+        """토큰 목록을 쉼표/BREAK 단위의 태그 목록으로 변환합니다.
+
+        가중치와 괄호는 제거하고 \\( \\) \\[ \\] \\{ \\} 이스케이프는 풀어 줍니다.
+        <lora:...> 태그는 텍스트가 아니므로 태그 목록에서 제외됩니다.
+        """
+        tags = []
+        current = []
+
+        for token in tokens:
+            if token["type"] in ("comma", "break"):
+                tag = "".join(current).strip()
+                if tag:
+                    tags.append(tag)
+                current = []
+            elif token["type"] in ("text", "wildcard"):
+                current.append(re.sub(r'\\([()\[\]{}])', r'\1', token["text"]))
+            elif token["type"] == "alt":
+                current.append("|")
+
+        tag = "".join(current).strip()
+        if tag:
+            tags.append(tag)
+        return tags
+
+    @staticmethod
+    def translate_prompt_tokens(tokens):
+        """텍스트 토큰 중 한글이 포함된 구간만 번역하고 문법 토큰은 그대로 유지합니다."""
+        spans = []
+        seen = set()
+        for token in tokens:
+            if token["type"] == "text":
+                stripped = token["text"].strip()
+                if stripped not in seen and ImagePromptUtils.is_valid_korean(stripped):
+                    seen.add(stripped)
+                    spans.append(stripped)
+
+        if not spans:
+            return tokens
+
+        # 이미 번역된 구간은 캐시에서 가져옴
+        cache = ImagePromptUtils.translation_cache
+        translations = {}
+        for span in spans:
+            cached = cache.get(span)
+            if cached is not None:
+                translations[span] = cached
+        missing = [span for span in spans if span not in translations]
+
+        # 한 번의 요청으로 번역하고, 줄 수가 맞지 않으면 구간별로 다시 번역
+        translated_missing = {}
+        if len(missing) > 1 and not any("\n" in span for span in missing):
+            translated = ImagePromptUtils.translate_korean_to_english("\n".join(missing))
+            lines = translated.split("\n") if isinstance(translated, str) else []
+            if len(lines) == len(missing):
+                translated_missing = {span: line.strip() for span, line in zip(missing, lines)}
+
+        if missing and not translated_missing:
+            for span in missing:
+                translated_missing[span] = ImagePromptUtils.translate_korean_to_english(span)
+
+        for span, translated in translated_missing.items():
+            # 번역 실패 시 원문이 그대로 돌아오므로 캐시하지 않음
+            if translated and translated != span:
+                ImagePromptUtils.cache_put(cache, span, translated)
+        translations.update(translated_missing)
+
+        result = []
+        for token in tokens:
+            stripped = token["text"].strip() if token["type"] == "text" else ""
+            if stripped in translations:
+                # 앞뒤 공백은 원문 그대로 보존
+                leading = token["text"][:len(token["text"]) - len(token["text"].lstrip())]
+                trailing = token["text"][len(token["text"].rstrip()):]
+                token = {"type": "text", "text": leading + translations[stripped] + trailing}
+            result.append(token)
+        return result
+
+    @staticmethod
+    def translate_prompt(text):
+        """프롬프트 문법을 유지한 채 한글 텍스트 구간만 영어로 번역합니다."""
+        if not ImagePromptUtils.is_valid_korean(text):
+            return text
+
+        tokens = ImagePromptUtils.tokenize_prompt(text)
+        return "".join(token["text"] for token in ImagePromptUtils.translate_prompt_tokens(tokens))
+
+    @staticmethod
+    def cache_put(cache, key, value):
+        """크기 제한이 있는 캐시에 값을 저장합니다. 가득 차면 가장 오래된 항목을 제거합니다."""
+        if key not in cache and len(cache) >= ImagePromptUtils.cache_max_entries:
+            try:
+                cache.pop(next(iter(cache.keys())), None)
+            except (StopIteration, RuntimeError):
+                # 비었거나 다른 스레드가 동시에 수정 중이면 제거를 건너뜀
+                pass
+        cache[key] = value
+
+    @staticmethod
+    def result_cache_key(img_path):
+        """파일 경로, 수정 시각, 크기로 결과 캐시 키를 만듭니다. 파일이 없으면 None."""
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            return None
+        return (os.path.realpath(img_path), stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def find_metadata_prompt_cached(img_path, debug=True):
+        """결과 캐시를 거쳐 find_metadata_prompt를 호출합니다. 파일이 바뀌면 다시 추출합니다.
+
+        프롬프트가 없으면 None을 반환하고 (캐시에는 빈 문자열로 저장), 실패하면 예외를 발생시킵니다.
+        """
+        key = ImagePromptUtils.result_cache_key(img_path)
+        if key is None:
+            return ImagePromptUtils.find_metadata_prompt(img_path, debug)
+
+        cached = ImagePromptUtils.result_cache.get(key)
+        if cached is not None:
+            if debug:
+                print(f"캐시된 프롬프트 사용: {img_path}")
+            return cached or None
+
+        prompt = ImagePromptUtils.find_metadata_prompt(img_path, debug)
+        ImagePromptUtils.cache_put(ImagePromptUtils.result_cache, key, prompt or "")
+        return prompt
+
+    @staticmethod
+    def load_image(img_path, max_side=0):
+        """이미지를 RGB로 로드합니다. max_side가 지정되면 긴 변이 max_side 이하가 되도록 축소 디코딩합니다.
+
+        JPEG는 Image.draft로 DCT 단계에서 바로 축소하고, PNG/WebP 등은 reduce()로 정수배 축소합니다.
+        """
+        img = Image.open(img_path)
+
+        if max_side and max_side > 0 and max(img.size) > max_side:
+            if img.format == "JPEG":
+                # 디코딩 전에 요청하면 1/2, 1/4, 1/8 배율로 디코딩됨 (요청 크기 이상 유지)
+                # 정사각형으로 요청하면 긴 이미지의 짧은 변 때문에 덜 축소되므로 원본 비율로 요청
+                width, height = img.size
+                long_side = max(width, height)
+                img.draft("RGB", (math.ceil(max_side * width / long_side), math.ceil(max_side * height / long_side)))
+
+            factor = max(img.size) // max_side
+            if factor > 1:
+                # 팔레트/1비트/16비트 이미지는 reduce()를 지원하지 않으므로 먼저 변환
+                if img.mode in ("P", "1", "I;16"):
+                    img = img.convert("RGBA" if img.mode == "P" else "RGB")
+                img = img.reduce(factor)
+
+            if max(img.size) > max_side:
+                img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        return img.convert("RGB")
+
     @staticmethod
     def extract_comfyui_prompt(metadata, debug=True):
         # ComfyUI 형식의 메타데이터에서 프롬프트 추출
@@ -338,11 +596,26 @@ class ImagePromptUtils:
     
     @staticmethod
     def extract_metadata_prompt(img_path, debug=True):
-        """이미지 파일에서 메타데이터 기반 프롬프트 추출"""
+        """이미지 파일에서 메타데이터 기반 프롬프트 추출 (실패 시 안내 문구를 반환)"""
+        if not os.path.exists(img_path):
+            return f"이미지 파일을 찾을 수 없습니다: {img_path}"
+        
+        try:
+            prompt = ImagePromptUtils.find_metadata_prompt(img_path, debug)
+        except Exception as e:
+            return f"오류 발생: {str(e)}"
+        
+        if prompt is None:
+            return "프롬프트를 찾을 수 없습니다."
+        return prompt
+
+    @staticmethod
+    def find_metadata_prompt(img_path, debug=True):
+        """이미지 파일에서 메타데이터 기반 프롬프트 추출. 찾지 못하면 None, 실패하면 예외를 발생시킴"""
         try:
             # 파일이 존재하는지 확인
             if not os.path.exists(img_path):
-                return f"이미지 파일을 찾을 수 없습니다: {img_path}"
+                raise FileNotFoundError(f"이미지 파일을 찾을 수 없습니다: {img_path}")
             
             # 이미지 열기
             img = Image.open(img_path)
@@ -666,13 +939,13 @@ class ImagePromptUtils:
             
             # 4. 프롬프트를 찾지 못한 경우
             if not selected_prompt:
-                return "프롬프트를 찾을 수 없습니다."
+                return None
             
             return selected_prompt['text']
             
         except Exception as e:
             print(f"오류 발생: {str(e)}")
-            return f"오류 발생: {str(e)}"
+            raise
 
 
 # 이미지 로드 및 프롬프트 추출 노드 - 번역 기능 추가
@@ -690,22 +963,31 @@ class ImagePromptExtractor:
                     "default": True,  # 기본적으로 번역 활성화
                     "label": "한글→영어 번역"
                 })
+            },
+            "optional": {
+                "max_side": ("INT", {
+                    "default": 0,  # 0이면 원본 해상도로 로드
+                    "min": 0,
+                    "max": 8192,
+                    "step": 64,
+                    "label": "미리보기 최대 크기 (0=원본)"
+                })
             }
         }
     
-    RETURN_TYPES = ("IMAGE", "STRING", "STRING")  # 번역된 프롬프트를 위한 출력 추가
-    RETURN_NAMES = ("image", "prompt", "translated_prompt")
+    RETURN_TYPES = ("IMAGE", "STRING", "STRING", "STRING")  # 번역된 프롬프트와 태그 목록 출력 추가
+    RETURN_NAMES = ("image", "prompt", "translated_prompt", "prompt_tags")
+    OUTPUT_IS_LIST = (False, False, False, True)  # 태그는 문자열 목록으로 출력
     FUNCTION = "load_image_and_extract"
     CATEGORY = "image"
     
-    def load_image_and_extract(self, image, translate_to_english=True):
+    def load_image_and_extract(self, image, translate_to_english=True, max_side=0):
         try:
             input_dir = folder_paths.get_input_directory()
             image_path = os.path.join(input_dir, image)
             
-            # 이미지 로드
-            i = Image.open(image_path)
-            i = i.convert("RGB")
+            # 이미지 로드 (max_side 지정 시 축소 디코딩)
+            i = ImagePromptUtils.load_image(image_path, max_side)
             
             # numpy 배열로 변환 후 torch 텐서로 변환 (채널 순서 유지)
             image_np = np.array(i).astype(np.float32) / 255.0
@@ -716,22 +998,35 @@ class ImagePromptExtractor:
             # 배치 차원 추가 (ComfyUI 표준 형식: [batch, height, width, channels])
             tensor_image = tensor_image.unsqueeze(0)
             
-            # 프롬프트 추출
-            prompt = ImagePromptUtils.extract_metadata_prompt(image_path)
+            # 프롬프트 추출 (캐시 사용)
+            try:
+                prompt = ImagePromptUtils.find_metadata_prompt_cached(image_path)
+            except Exception as e:
+                error_msg = f"오류 발생: {str(e)}"
+                return (tensor_image, error_msg, error_msg, [error_msg])
+            
+            # 프롬프트가 없으면 안내 문구를 번역하지 않고 그대로 출력
+            if prompt is None:
+                message = "프롬프트를 찾을 수 없습니다."
+                return (tensor_image, message, message, [message])
             
             # 한글인 경우 번역
             translated_prompt = prompt
             if translate_to_english and ImagePromptUtils.is_valid_korean(prompt):
                 print("한글 프롬프트 발견, 영어로 번역 중...")
-                translated_prompt = ImagePromptUtils.translate_korean_to_english(prompt)
+                # 가중치/LoRA 등 문법 토큰은 그대로 두고 텍스트 구간만 번역
+                translated_prompt = ImagePromptUtils.translate_prompt(prompt)
                 print(f"번역 완료: {translated_prompt[:100]}{'...' if len(translated_prompt) > 100 else ''}")
             
-            return (tensor_image, prompt, translated_prompt)
+            # 최종 프롬프트를 태그 목록으로 분리 (빈 목록이면 하위 노드가 실행되지 않으므로 빈 문자열 하나 유지)
+            prompt_tags = ImagePromptUtils.prompt_tags(ImagePromptUtils.tokenize_prompt(translated_prompt)) or [""]
+            
+            return (tensor_image, prompt, translated_prompt, prompt_tags)
         except Exception as e:
             # 오류 발생 시 빈 이미지와 오류 메시지 반환 (배치 차원 포함)
             empty_img = torch.zeros((1, 64, 64, 3), dtype=torch.float32)
             error_msg = f"오류 발생: {str(e)}"
-            return (empty_img, error_msg, error_msg)
+            return (empty_img, error_msg, error_msg, [error_msg])
 
 
 # NODE_CLASS_MAPPINGS 정의
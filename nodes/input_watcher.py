@@ -0,0 +1,168 @@
+"""입력 폴더 감시자 - 업로드된 이미지의 프롬프트를 미리 추출해 캐시에 채워 둡니다.
+
+워크플로우 실행 전에 메타데이터 파싱과 번역을 끝내 두어, 노드 실행 시 캐시를 바로 사용하게 합니다.
+환경 변수 IMAGE_PROMPT_EXTRACTOR_WATCH=1 로 켤 수 있습니다 (기본값: 꺼짐).
+inotify_simple 패키지가 있으면 inotify를 사용하고, 없으면 scandir로 주기적으로 확인합니다.
+"""
+import os
+import queue
+import threading
+import time
+
+from .image_prompt_extractor import ImagePromptUtils
+
+# inotify는 선택 사항 (없으면 폴링으로 동작)
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+class InputWatcher:
+    """입력 폴더를 감시하며 새 이미지의 프롬프트 추출과 번역을 백그라운드에서 수행합니다."""
+
+    def __init__(self, directory, translate=True, workers=1, max_queue=256,
+                 poll_interval=2.0, recent_seconds=300):
+        self.directory = directory
+        self.translate = translate
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.recent_seconds = recent_seconds  # 이 시간 안에 수정된 파일만 미리 처리
+        # 대기열이 결과 캐시보다 크면 나중에 처리된 파일이 방금 캐시한 파일을 밀어내므로 캐시 크기 이하로 제한
+        self.work_queue = queue.PriorityQueue(maxsize=min(max_queue, ImagePromptUtils.cache_max_entries))
+        self._seen = {}  # 경로 → (mtime_ns, 크기), 대기열에 넣은 파일만 기록
+        self._seq = 0
+        self._needs_rescan = False  # 대기열이 가득 차 넣지 못한 파일이 있으면 True
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return self
+        self._threads.append(threading.Thread(target=self._watch, name="InputWatcher", daemon=True))
+        for n in range(self.workers):
+            self._threads.append(threading.Thread(target=self._work, name=f"InputWatcherWorker-{n}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, path, stat=None, is_new=False):
+        """최근에 올라온 파일을 작업 대기열에 넣습니다. 최신 파일일수록 먼저 처리됩니다.
+
+        is_new가 True이면 (inotify로 방금 들어온 것이 확인된 파일) 시각과 관계없이 최근 파일로 취급합니다.
+        """
+        if not path.lower().endswith(IMAGE_EXTENSIONS):
+            return False
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return False
+
+        # mv, cp -p, rsync -a, 압축 해제는 원래 mtime을 유지하므로 이름 변경 시 갱신되는 ctime도 함께 봄
+        arrived_ns = max(stat.st_mtime_ns, stat.st_ctime_ns)
+        if is_new:
+            arrived_ns = max(arrived_ns, time.time_ns())
+
+        # 오래된 파일까지 미리 처리하면 최근 업로드가 캐시에서 밀려나므로 건너뜀
+        if time.time_ns() - arrived_ns >= self.recent_seconds * 1_000_000_000:
+            return False
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._seen.get(path) == signature:
+                return False
+            if ImagePromptUtils.result_cache_key(path) in ImagePromptUtils.result_cache:
+                self._seen[path] = signature
+                return False
+
+            # 우선순위: (최신순, 넣은 순서)
+            self._seq += 1
+            item = (-arrived_ns, self._seq, path)
+            try:
+                self.work_queue.put_nowait(item)
+            except queue.Full:
+                # 기록하지 않고 다시 확인하도록 표시 (대기열에 자리가 나면 scan으로 재시도)
+                self._needs_rescan = True
+                return False
+            self._seen[path] = signature
+            return True
+
+    def scan(self):
+        """scandir로 폴더를 훑어 새로 생기거나 바뀐 파일을 대기열에 넣습니다."""
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        self.enqueue(entry.path, entry.stat())
+        except OSError as e:
+            print(f"입력 폴더 확인 오류: {e}")
+
+    def _watch(self):
+        self.scan()
+
+        inotify = None
+        if INotify is not None:
+            try:
+                inotify = INotify()
+                inotify.add_watch(self.directory, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+            except OSError as e:
+                print(f"inotify 사용 불가, 폴링으로 전환: {e}")
+                inotify = None
+
+        while not self._stop.is_set():
+            if inotify is not None:
+                events = inotify.read(timeout=int(self.poll_interval * 1000))
+                for event in events:
+                    if event.name:
+                        self.enqueue(os.path.join(self.directory, event.name), is_new=True)
+                # inotify 모드에서는 주기적 scan이 없으므로 놓친 파일이 있을 때만 다시 훑음
+                if self._needs_rescan and not self.work_queue.full():
+                    self._needs_rescan = False
+                    self.scan()
+            else:
+                self._stop.wait(self.poll_interval)
+                self.scan()
+
+        if inotify is not None:
+            inotify.close()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                _, _, path = self.work_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                prompt = ImagePromptUtils.find_metadata_prompt_cached(path, debug=False)
+                # 프롬프트가 없는 이미지는 번역할 것이 없음
+                if prompt and self.translate and ImagePromptUtils.is_valid_korean(prompt):
+                    ImagePromptUtils.translate_prompt(prompt)
+            except Exception as e:
+                print(f"프롬프트 미리 추출 오류 ({path}): {e}")
+            finally:
+                self.work_queue.task_done()
+
+
+def start_from_env():
+    """IMAGE_PROMPT_EXTRACTOR_WATCH=1 이면 ComfyUI 입력 폴더 감시를 시작합니다."""
+    if os.environ.get("IMAGE_PROMPT_EXTRACTOR_WATCH", "").lower() not in ("1", "true", "yes"):
+        return None
+
+    try:
+        import folder_paths
+    except ModuleNotFoundError:
+        return None
+
+    translate = os.environ.get("IMAGE_PROMPT_EXTRACTOR_WATCH_TRANSLATE", "1").lower() in ("1", "true", "yes")
+    watcher = InputWatcher(folder_paths.get_input_directory(), translate=translate)
+    print(f"입력 폴더 감시 시작: {watcher.directory} (inotify: {'사용' if INotify is not None else '미사용'})")
+    return watcher.start()
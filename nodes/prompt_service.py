@@ -0,0 +1,234 @@
+"""ComfyUI 외부에서 실행하는 프롬프트 추출 서비스
+
+미리 띄워 둔 워커 프로세스 풀에서 ImagePromptUtils로 프롬프트를 추출하고,
+로컬 HTTP로 요청을 받아 결과를 한 줄씩(NDJSON) 스트리밍합니다.
+
+실행 (저장소 루트에서):
+    python -m nodes.prompt_service --root /path/to/images --port 8189
+
+요청:
+    GET  /health
+    POST /extract  {"paths": ["a.png", "b.jpg"], "translate": true}
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from .image_prompt_extractor import ImagePromptUtils
+
+
+class StubTranslator:
+    """네트워크 없이 동작하는 테스트용 번역기 (각 줄 앞에 "en-"을 붙임)"""
+
+    def __init__(self, source='ko', target='en'):
+        self.source = source
+        self.target = target
+
+    def translate(self, text):
+        return "\n".join(f"{self.target}-{line}" for line in text.split("\n"))
+
+
+def _init_worker(result_cache, translation_cache, stub_translator):
+    # 워커마다 공유 캐시를 연결하고 PIL 플러그인을 미리 로드
+    ImagePromptUtils.result_cache = result_cache
+    ImagePromptUtils.translation_cache = translation_cache
+    if stub_translator:
+        ImagePromptUtils.translator_factory = StubTranslator
+    Image.init()
+
+
+def _extract_prompt(path, image_path, translate):
+    try:
+        if not os.path.isfile(image_path):
+            return {"path": path, "error": f"이미지 파일을 찾을 수 없습니다: {path}"}
+
+        cached = ImagePromptUtils.result_cache_key(image_path) in ImagePromptUtils.result_cache
+        prompt = ImagePromptUtils.find_metadata_prompt_cached(image_path, debug=False)
+        # 프롬프트가 없는 이미지는 번역/태그 분리 없이 no_prompt 상태로 반환
+        if prompt is None:
+            return {
+                "path": path,
+                "status": "no_prompt",
+                "prompt": "",
+                "translated_prompt": "",
+                "prompt_tags": [],
+                "cached": cached,
+            }
+
+        translated_prompt = prompt
+        if translate and ImagePromptUtils.is_valid_korean(prompt):
+            translated_prompt = ImagePromptUtils.translate_prompt(prompt)
+        return {
+            "path": path,
+            "status": "ok",
+            "prompt": prompt,
+            "translated_prompt": translated_prompt,
+            "prompt_tags": ImagePromptUtils.prompt_tags(ImagePromptUtils.tokenize_prompt(translated_prompt)),
+            "cached": cached,
+        }
+    except Exception as e:
+        # 예외 메시지에 포함된 서버 절대 경로는 요청 경로로 바꿔서 반환
+        return {"path": path, "error": f"오류 발생: {str(e).replace(image_path, path)}"}
+
+
+class PromptService:
+    """워커 풀, 공유 캐시, 대기열 제한을 관리합니다."""
+
+    def __init__(self, root, workers=None, max_pending=64, queue_timeout=30.0, stub_translator=False):
+        self.root = os.path.realpath(root)
+        self.queue_timeout = queue_timeout
+        self.manager = multiprocessing.Manager()
+        self.result_cache = self.manager.dict()
+        self.translation_cache = self.manager.dict()
+        self.pool = multiprocessing.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(self.result_cache, self.translation_cache, stub_translator),
+        )
+        self.workers = workers or os.cpu_count()
+        # 전체 요청에 걸쳐 동시에 처리 중이거나 대기 중인 작업 수 제한
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+    def resolve(self, path):
+        """root 내부의 실제 경로를 반환합니다. 밖을 가리키면 None."""
+        if not isinstance(path, str) or not path:
+            return None
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, resolved]) != self.root:
+            return None
+        return resolved
+
+    def submit(self, path, image_path, translate, results):
+        """슬롯을 이미 획득한 상태에서 작업을 넣습니다. 완료되면 슬롯을 반납합니다."""
+        def done(result):
+            self.slots.release()
+            results.put(result)
+
+        def failed(error):
+            self.slots.release()
+            results.put({"path": path, "error": f"오류 발생: {str(error)}"})
+
+        self.pool.apply_async(_extract_prompt, (path, image_path, translate), callback=done, error_callback=failed)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        self.manager.shutdown()
+
+
+class PromptServiceHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_line(self, data):
+        self.wfile.write(json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(200, {
+            "status": "ok",
+            "workers": self.service.workers,
+            "cached_results": len(self.service.result_cache),
+            "cached_translations": len(self.service.translation_cache),
+        })
+
+    def do_POST(self):
+        if self.path != "/extract":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            paths = request["paths"]
+            translate = bool(request.get("translate", True))
+            if not isinstance(paths, list):
+                raise ValueError("paths는 목록이어야 합니다")
+        except Exception as e:
+            self._send_json(400, {"error": f"잘못된 요청: {str(e)}"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+
+        service = self.service
+        results = queue.Queue()
+        pending = 0
+        try:
+            for path in paths:
+                image_path = service.resolve(path)
+                if image_path is None:
+                    self._write_line({"path": path, "error": "허용되지 않은 경로입니다"})
+                    continue
+
+                # 대기열이 가득 차면 완료된 결과를 먼저 내보내며 자리가 날 때까지 대기 (backpressure)
+                acquired = service.slots.acquire(blocking=False)
+                while not acquired and pending:
+                    self._write_line(results.get())
+                    pending -= 1
+                    acquired = service.slots.acquire(blocking=False)
+                if not acquired:
+                    acquired = service.slots.acquire(timeout=service.queue_timeout)
+                if not acquired:
+                    self._write_line({"path": path, "error": "대기열이 가득 찼습니다"})
+                    continue
+
+                service.submit(path, image_path, translate, results)
+                pending += 1
+
+            while pending:
+                self._write_line(results.get())
+                pending -= 1
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 끊겨도 진행 중인 작업은 완료 시 슬롯을 반납함
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="이미지 프롬프트 추출 서비스")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8189)
+    parser.add_argument("--root", default=os.getcwd(), help="요청 경로의 기준 디렉터리")
+    parser.add_argument("--workers", type=int, default=None, help="워커 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--max-pending", type=int, default=64, help="동시에 대기할 수 있는 최대 작업 수")
+    parser.add_argument("--stub-translator", action="store_true", help="네트워크 없이 스텁 번역기 사용")
+    args = parser.parse_args(argv)
+
+    service = PromptService(
+        args.root,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        stub_translator=args.stub_translator,
+    )
+    PromptServiceHandler.service = service
+    server = ThreadingHTTPServer((args.host, args.port), PromptServiceHandler)
+    server.daemon_threads = True
+    print(f"프롬프트 추출 서비스 시작: http://{args.host}:{server.server_address[1]} (워커 {service.workers}개)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()